@@ -1,18 +1,30 @@
 import os
 from dotenv import load_dotenv # 環境変数(.env)を読み込むために追加
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, Response, stream_with_context
 from markupsafe import escape, Markup
 import html
 import re
+import hashlib
+import copy
+import functools
+import tempfile
+import threading
+import time
+import multiprocessing
+from collections import OrderedDict
+import xml.etree.ElementTree as ET
 
 from waitress import serve
 
 import arxiv
-from metapub import PubMedFetcher
+from metapub import PubMedFetcher, PubMedArticle
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import orjson
 from citeproc import Citation, CitationItem, CitationStylesStyle, CitationStylesBibliography, formatter
 from citeproc.source.json import CiteProcJSON
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
 
 # .envファイルから環境変数を読み込む (NCBI_API_KEYのため)
@@ -46,29 +58,98 @@ else:
     fetcher = PubMedFetcher()
     logger.warning("NCBI API Key not found. Rate limits may apply.")
 
+# NCBI E-utilitiesへの問い合わせ間隔（APIキーなしで3回/秒、ありで10回/秒）
+# metapub 0.6系が使うeutilsのクライアントはプロセス全体で1つだけ共有され、
+# その間隔制御はロックなしで前回時刻を読むだけなので、複数スレッドから同時に呼ぶと制限を超えて429エラーになる。
+# そのため問い合わせの開始時刻をこちらで割り当てる（ロックは割り当ての間だけ持ち、通信中は持たない）
+NCBI_MIN_INTERVAL = 0.1 if NCBI_API_KEY else 1 / 3
+_ncbi_lock = threading.Lock()
+_ncbi_next_slot = 0.0
+
+
+def _wait_for_ncbi_slot():
+    """
+    NCBIへの次の問い合わせ枠を予約し、その時刻まで待つ
+    """
+    global _ncbi_next_slot
+    with _ncbi_lock:
+        now = time.monotonic()
+        slot = max(now, _ncbi_next_slot)
+        _ncbi_next_slot = slot + NCBI_MIN_INTERVAL
+    if slot > now:
+        time.sleep(slot - now)
+
+# 論文データ取得用のスレッドプール（ネットワーク待ちを並列化する）
+# PubMedへの問い合わせは_wait_for_ncbi_slotで開始間隔が空けられる（通信自体は並列になりうる）
+FETCH_MAX_WORKERS = 8
+_fetch_pool = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS)
+
+# arXiv API用のクライアント（arxiv 2.x以降はSearch.results()ではなくClient.results()で取得する）
+arxiv_client = arxiv.Client()
+
+# 外部HTTP通信用のセッション（keep-aliveで接続を使い回す）
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
 # CSLファイルを保存するディレクトリ
 CSL_DIR = 'csl_styles'
 if not os.path.exists(CSL_DIR):
     os.makedirs(CSL_DIR)
 
+# スタイルが見つからない場合に使うデフォルトスタイル
+DEFAULT_STYLE = 'nature'
+
+# CSL公式リポジトリ（styles）のトップレベルにあるスタイル名の一覧
+KNOWN_STYLES_FILE = 'KNOWN_STYLES.txt'
+
+def load_known_styles():
+    """
+    既知のスタイル名の一覧を読み込む。ファイルがなければNone（名前の事前チェックをしない）
+    """
+    try:
+        with open(KNOWN_STYLES_FILE, 'r', encoding='utf-8') as f:
+            return frozenset(line.strip() for line in f if line.strip())
+    except OSError as e:
+        logger.warning(f"Known styles list not loaded: {str(e)}")
+        return None
+
+KNOWN_STYLES = load_known_styles()
+
 def get_csl_path(style_name):
     """
     指定されたスタイルのCSLファイルパスを返す。ローカルになければ公式GitHubからダウンロードする。
+    既知のスタイル一覧にない名前は、ダウンロードを試みずにデフォルトスタイルを使う。
     """
     file_path = os.path.join(CSL_DIR, f"{style_name}.csl")
     
     if not os.path.exists(file_path):
+        # 既知でないスタイル名はGitHubに問い合わせずデフォルトスタイルにする
+        if style_name != DEFAULT_STYLE and KNOWN_STYLES is not None and style_name not in KNOWN_STYLES:
+            logger.warning(f"Style '{style_name}' is not a known style. Using '{DEFAULT_STYLE}'.")
+            return get_csl_path(DEFAULT_STYLE)
+        
         # CSL公式リポジトリからrawデータを取得
         url = f"https://raw.githubusercontent.com/citation-style-language/styles/master/{style_name}.csl"
         try:
-            response = requests.get(url)
+            response = http_session.get(url, timeout=5)
             if response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
+                # 複数のワーカーが同時にダウンロードしても、解析中のファイルを書き換えないよう
+                # 一時ファイルに書いてからos.replaceで置き換える
+                fd, tmp_path = tempfile.mkstemp(dir=CSL_DIR, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(response.content)
+                    os.replace(tmp_path, file_path)
+                except Exception:
+                    os.remove(tmp_path)
+                    raise
                 logger.info(f"Downloaded CSL style: {style_name}")
             else:
-                logger.warning(f"Style '{style_name}' not found (Status {response.status_code}). Using 'nature'.")
-                return get_csl_path('nature')
+                logger.warning(f"Style '{style_name}' not found (Status {response.status_code}). Using '{DEFAULT_STYLE}'.")
+                # デフォルトスタイル自体が取得できない場合は再帰しない
+                if style_name == DEFAULT_STYLE:
+                    return None
+                return get_csl_path(DEFAULT_STYLE)
         except Exception as e:
             logger.error(f"Download Error for style '{style_name}': {str(e)}")
             return None
@@ -76,6 +157,39 @@ def get_csl_path(style_name):
     return file_path
 
 
+class _StyleLoadError(Exception):
+    """
+    CSLスタイルの読み込み失敗を表す（lru_cacheに失敗結果を残さないために例外で返す）
+    """
+
+
+def _parse_style(style_name):
+    """
+    CSLファイルのパスを解決（必要ならダウンロード）して解析する
+    """
+    csl_path = get_csl_path(style_name)
+    if not csl_path:
+        raise _StyleLoadError(style_name)
+    return CitationStylesStyle(csl_path, validate=False)
+
+
+# 解析済みスタイルのキャッシュはスレッドごとに持つ
+# CitationStylesStyleは整形中に内部状態（formatterや省略の状態）を書き換えるため、スレッド間で共有できない
+_style_cache = threading.local()
+
+
+def _load_style(style_name):
+    """
+    スタイル名ごとにCSLファイルを一度だけ解析し、CitationStylesStyleを使い回す（スレッドごと）。
+    ファイルパスの解決（os.path.existsやダウンロード）も初回だけ行われる
+    """
+    load = getattr(_style_cache, 'load', None)
+    if load is None:
+        load = _style_cache.load = functools.lru_cache(maxsize=32)(_parse_style)
+    return load(style_name)
+
+
+@functools.lru_cache(maxsize=8192)
 def process_given_name(given_name):
     """
     given nameを適切に処理する
@@ -93,30 +207,23 @@ def process_given_name(given_name):
     if not given_name:
         return ""
     
-    # スペースで分割
-    parts = given_name.split()
     processed_parts = []
     comma_inserted = False
     
-    for part in parts:
-        if not part:
-            continue
-        
-        # 小文字で始まる場合（例: 'von', 'de', 'van'など）
-        if part[0].islower():
-            processed_parts.append(part)
+    # スペースで分割（split()は空のパートを返さない）
+    for part in given_name.split():
         # 大文字のみで構成されているかチェック
-        elif part.isupper() and part.isalpha():
+        # 小文字で始まるパート（例: 'von', 'de', 'van'など）はisupper()がFalseになる
+        if part.isupper() and part.isalpha():
             # カンマがまだ挿入されていない場合、最後の混合パートの後に挿入
             if not comma_inserted and processed_parts:
                 # 最後の要素にカンマを追加
-                processed_parts[-1] = processed_parts[-1] + ','
+                processed_parts[-1] += ','
                 comma_inserted = True
-            # イニシャル化: 'CS' -> 'C. S.'
-            initials = '. '.join(list(part)) + '.'
-            processed_parts.append(initials)
+            # イニシャル化: 'CS' -> 'C. S.'（文字列をそのままjoinしてリスト化を省く）
+            processed_parts.append('. '.join(part) + '.')
         else:
-            # 大文字小文字混合の場合
+            # 小文字始まり・大文字小文字混合の場合はそのまま保持
             processed_parts.append(part)
     
     # 最後まで混合パートが見つからなかった場合（全てイニシャルの場合）
@@ -125,74 +232,104 @@ def process_given_name(given_name):
     return ' '.join(processed_parts)
 
 
-def fetch_paper_data_csl(source_type, paper_id):
+@functools.lru_cache(maxsize=8192)
+def _pubmed_name_parts(name):
+    """
+    PubMed形式 "Family Given" / "von Family Given" を (family, given, 接頭辞) に分割する
+    最初の大文字始まりのパートがfamily name、その前の小文字始まりのパートが接頭辞
+    """
+    parts = name.split()
+    if not parts:
+        return None
+    
+    # 全て小文字始まりの場合（ありえないが念のため）は先頭をfamily nameとする
+    family_idx = next((i for i, part in enumerate(parts) if part[0].isupper()), 0)
+    given = ' '.join(parts[family_idx + 1:])
+    return parts[family_idx], process_given_name(given), ' '.join(parts[:family_idx])
+
+
+@functools.lru_cache(maxsize=8192)
+def _western_name_parts(name):
+    """
+    arXiv/bioRxiv形式 "Given Family" / "Given von Family" を (family, given, 接頭辞) に分割する
+    最後のパートがfamily name、その直前に続く小文字始まりのパートが接頭辞
+    """
+    parts = name.split()
+    if not parts:
+        return None
+    
+    family_idx = len(parts) - 1
+    while family_idx > 0 and parts[family_idx - 1][0].islower():
+        family_idx -= 1
+    given = ' '.join(parts[:family_idx])
+    return parts[-1], process_given_name(given), ' '.join(parts[family_idx:-1])
+
+
+def _author_entry(name_parts):
+    """
+    (family, given, 接頭辞) からCSL-JSONの著者エントリ（辞書）を作る。分割できなかった場合はNone
+    キャッシュされるのはタプルなので、辞書は毎回新しく作る
+    """
+    if not name_parts:
+        return None
+    
+    family, given, particle = name_parts
+    author_entry = {"family": family, "given": given}
+    if particle:
+        author_entry["non-dropping-particle"] = particle
+    return author_entry
+
+
+def _split_pubmed_name(name):
+    """
+    PubMedの著者名をCSL-JSONの著者エントリに変換する
+    """
+    return _author_entry(_pubmed_name_parts(name)) if name else None
+
+
+def _split_western_name(name):
+    """
+    arXiv/bioRxivの著者名をCSL-JSONの著者エントリに変換する
+    """
+    return _author_entry(_western_name_parts(name)) if name else None
+
+
+def _sanitize_error_message(e):
+    """
+    APIキーや機密情報を含む可能性があるエラーメッセージをサニタイズする
+    """
+    safe_error_msg = str(e)
+    if NCBI_API_KEY and NCBI_API_KEY in safe_error_msg:
+        safe_error_msg = safe_error_msg.replace(NCBI_API_KEY, "[API_KEY_HIDDEN]")
+    return safe_error_msg
+
+
+def fetch_paper_data_csl(source_type, paper_id, prefetched=None):
     """
     citeproc-py (CSL-JSON) が解釈できる形式でデータを返す
     given nameの処理を改善
     family nameの接頭辞（von, van, de等）を適切に処理
+    
+    Args:
+        source_type: 'pubmed', 'arxiv', 'biorxiv'
+        paper_id: 論文ID
+        prefetched: 一括取得済みのPubMedArticle / arxiv.Result（Noneの場合は個別に取得する）
     """
     data = {}
     try:
         # --- データ取得ロジック ---
         if source_type == 'pubmed':
-            article = fetcher.article_by_pmid(paper_id)
+            if prefetched is not None:
+                article = prefetched
+            else:
+                _wait_for_ncbi_slot()
+                article = fetcher.article_by_pmid(paper_id)
             authors_list = []
             for author_name in article.authors:
-                if not author_name:
-                    continue
-                parts = author_name.split(' ')
-                
-                #print(f"PubMed author raw: '{author_name}' -> parts: {parts}")
-                
-                if len(parts) >= 2:
-                    # PubMedの形式: "Family Given" または "von Family Given"
-                    # 小文字で始まる部分を検出してfamily nameの接頭辞として扱う
-                    
-                    family_parts = []
-                    given_start_idx = 0
-                    
-                    # 前から見ていって、最初の大文字始まりまでがfamily nameの一部
-                    for i, part in enumerate(parts):
-                        if part and part[0].isupper():
-                            # 最初の大文字始まりがfamily nameの主要部分
-                            # その前の小文字始まり部分は接頭辞
-                            given_start_idx = i + 1
-                            
-                            # 接頭辞がある場合
-                            if i > 0:
-                                non_dropping = ' '.join(parts[:i])
-                                family = part
-                                given = ' '.join(parts[i + 1:]) if len(parts) > i + 1 else ""
-                                
-                                processed_given = process_given_name(given)
-                                authors_list.append({
-                                    "family": family,
-                                    "given": processed_given,
-                                    "non-dropping-particle": non_dropping
-                                })
-                            else:
-                                # 接頭辞がない通常のケース
-                                family = part
-                                given = ' '.join(parts[i + 1:]) if len(parts) > i + 1 else ""
-                                
-                                processed_given = process_given_name(given)
-                                authors_list.append({
-                                    "family": family,
-                                    "given": processed_given
-                                })
-                            break
-                    else:
-                        # 全て小文字始まりの場合（ありえないが念のため）
-                        family = parts[0]
-                        given = ' '.join(parts[1:]) if len(parts) > 1 else ""
-                        processed_given = process_given_name(given)
-                        authors_list.append({
-                            "family": family,
-                            "given": processed_given
-                        })
-                        
-                elif len(parts) == 1:
-                    authors_list.append({"family": parts[0], "given": ""})
+                # PubMedの形式: "Family Given" または "von Family Given"
+                author_entry = _split_pubmed_name(author_name)
+                if author_entry:
+                    authors_list.append(author_entry)
             
             data = {
                 "id": paper_id,
@@ -208,47 +345,17 @@ def fetch_paper_data_csl(source_type, paper_id):
             #print(data)
         
         elif source_type == 'arxiv':
-            search = arxiv.Search(id_list=[paper_id])
-            paper = next(search.results())
+            if prefetched is not None:
+                paper = prefetched
+            else:
+                search = arxiv.Search(id_list=[paper_id])
+                paper = next(arxiv_client.results(search))
             authors_list = []
             for author in paper.authors:
-                parts = author.name.split(' ')
-                if len(parts) >= 2:
-                    # family nameの接頭辞を検出
-                    family_parts = []
-                    given_parts = []
-                    
-                    # 後ろから処理: 最後が family name
-                    family_idx = len(parts) - 1
-                    
-                    # 最後から2番目以降で小文字始まりがあればそれも family name の一部
-                    while family_idx > 0 and parts[family_idx - 1][0].islower():
-                        family_idx -= 1
-                    
-                    # family name部分
-                    family_parts = parts[family_idx:]
-                    # given name部分
-                    given_parts = parts[:family_idx]
-                    
-                    given = ' '.join(given_parts)
-                    processed_given = process_given_name(given)
-                    
-                    # 小文字始まりの接頭辞がある場合
-                    if len(family_parts) > 1 and family_parts[0][0].islower():
-                        author_entry = {
-                            "family": family_parts[-1],  # 実際のfamily name
-                            "given": processed_given,
-                            "non-dropping-particle": ' '.join(family_parts[:-1])  # 接頭辞（von, van等）
-                        }
-                    else:
-                        author_entry = {
-                            "family": ' '.join(family_parts),
-                            "given": processed_given
-                        }
-                    
+                # arXivの形式: "Given Family" または "Given von Family"
+                author_entry = _split_western_name(author.name)
+                if author_entry:
                     authors_list.append(author_entry)
-                elif len(parts) == 1:
-                    authors_list.append({"family": parts[0], "given": ""})
             
             data = {
                 "id": paper_id,
@@ -263,39 +370,16 @@ def fetch_paper_data_csl(source_type, paper_id):
 
         elif source_type == 'biorxiv':
             url = f"https://api.biorxiv.org/details/biorxiv/{paper_id}"
-            resp = requests.get(url).json()
+            # 共有セッションで接続を使い回し、JSONはorjsonで解析する
+            response = http_session.get(url, timeout=10)
+            resp = orjson.loads(response.content)
             if resp.get('messages') and resp['messages'][0]['status'] == 'ok':
                 item = resp['collection'][-1]
                 authors_list = []
                 for auth in item['authors'].split(';'):
-                    parts = auth.strip().split(' ')
-                    if len(parts) >= 2:
-                        # family nameの接頭辞を検出
-                        family_idx = len(parts) - 1
-                        while family_idx > 0 and parts[family_idx - 1][0].islower():
-                            family_idx -= 1
-                        
-                        family_parts = parts[family_idx:]
-                        given_parts = parts[:family_idx]
-                        
-                        given = ' '.join(given_parts)
-                        processed_given = process_given_name(given)
-                        
-                        if len(family_parts) > 1 and family_parts[0][0].islower():
-                            author_entry = {
-                                "family": family_parts[-1],
-                                "given": processed_given,
-                                "non-dropping-particle": ' '.join(family_parts[:-1])
-                            }
-                        else:
-                            author_entry = {
-                                "family": ' '.join(family_parts),
-                                "given": processed_given
-                            }
-                        
+                    author_entry = _split_western_name(auth)
+                    if author_entry:
                         authors_list.append(author_entry)
-                    elif len(parts) == 1:
-                        authors_list.append({"family": parts[0], "given": ""})
 
                 data = {
                     "id": paper_id,
@@ -313,14 +397,166 @@ def fetch_paper_data_csl(source_type, paper_id):
         return data
 
     except Exception as e:
-        # APIキーや機密情報を含む可能性があるエラーメッセージをサニタイズ
-        safe_error_msg = str(e)
-        if NCBI_API_KEY and NCBI_API_KEY in safe_error_msg:
-            safe_error_msg = safe_error_msg.replace(NCBI_API_KEY, "[API_KEY_HIDDEN]")
-        
+        safe_error_msg = _sanitize_error_message(e)
         logger.error(f"Error fetching paper {paper_id} ({source_type}): {safe_error_msg}")
         return None
 
+# 取得済みCSL-JSONを保存するキャッシュディレクトリ
+CACHE_DIR = 'csl_cache'
+if not os.path.exists(CACHE_DIR):
+    os.makedirs(CACHE_DIR)
+
+
+class _FetchFailed(Exception):
+    """
+    論文データの取得失敗を表す（lru_cacheに失敗結果を残さないために例外で返す）
+    """
+
+
+def _cache_file_path(source_type, paper_id):
+    """
+    (source_type, paper_id) に対応するキャッシュファイルのパスを返す。
+    ファイル数が増えても1ディレクトリに集中しないようハッシュで階層化する（例: 0c/c1/75/...）
+    """
+    digest = hashlib.sha256(f"{source_type}:{paper_id}".encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, digest[0:2], digest[2:4], digest[4:6], f"{digest}.json")
+
+
+def _write_cache_file(cache_path, data):
+    """
+    一時ファイルに書いてからos.replaceで置き換える（書き込み途中のファイルを読ませない）
+    """
+    try:
+        cache_dir = os.path.dirname(cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(orjson.dumps(data))
+            os.replace(tmp_path, cache_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    except Exception as e:
+        logger.warning(f"Cache write error for {cache_path}: {str(e)}")
+
+
+@functools.lru_cache(maxsize=4096)
+def _fetch_paper_data_cached(source_type, paper_id):
+    """
+    メモリ(LRU) -> ディスク -> ネットワークの順にCSL-JSONを探す。
+    取得に失敗した場合は_FetchFailedを送出する（失敗はキャッシュしない）
+    """
+    cache_path = _cache_file_path(source_type, paper_id)
+    try:
+        with open(cache_path, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        pass
+
+    data = fetch_paper_data_csl(source_type, paper_id)
+    if not data:
+        raise _FetchFailed(paper_id)
+
+    _write_cache_file(cache_path, data)
+    return data
+
+
+def get_paper_data_csl(source_type, paper_id):
+    """
+    キャッシュ付きでCSL-JSONを返す。取得できない場合はNone
+    """
+    try:
+        # キャッシュ内の辞書を呼び出し側で書き換えられないようコピーを返す
+        return copy.deepcopy(_fetch_paper_data_cached(source_type, paper_id))
+    except _FetchFailed:
+        return None
+
+# EFetchで一度に問い合わせるPMIDの上限（URL長の制限のため分割する）
+PUBMED_BATCH_SIZE = 200
+
+
+def _batch_fetch_pubmed(pmids):
+    """
+    NCBI EFetchにカンマ区切りでPMIDを渡し、1回のリクエストで複数の論文を取得する。
+    {pmid: PubMedArticle} を返す（取得できなかったPMIDは含まれない）
+    """
+    articles = {}
+    for start in range(0, len(pmids), PUBMED_BATCH_SIZE):
+        chunk = pmids[start:start + PUBMED_BATCH_SIZE]
+        _wait_for_ncbi_slot()
+        result = fetcher.qs.efetch({'db': 'pubmed', 'id': ','.join(chunk)})
+        if not result:
+            continue
+        root = ET.fromstring(result)
+        for elem in root:
+            if elem.tag not in ('PubmedArticle', 'PubmedBookArticle'):
+                continue
+            # PubMedArticleは単独取得時と同じくPubmedArticleSetで包まれたXMLを前提とする
+            xml_str = f"<PubmedArticleSet>{ET.tostring(elem, encoding='unicode')}</PubmedArticleSet>"
+            article = PubMedArticle(xml_str)
+            if article.pmid:
+                articles[str(article.pmid)] = article
+    return articles
+
+
+def _batch_fetch_arxiv(arxiv_ids):
+    """
+    arxiv.Searchのid_listに全IDを渡して一括取得する。
+    {入力ID: arxiv.Result} を返す（バージョン指定なしのIDにも対応）
+    """
+    search = arxiv.Search(id_list=arxiv_ids, max_results=len(arxiv_ids))
+    papers = {}
+    for paper in arxiv_client.results(search):
+        short_id = paper.get_short_id()
+        papers[short_id] = paper
+        base_id, _, version = short_id.rpartition('v')
+        if base_id and version.isdigit():
+            papers.setdefault(base_id, paper)
+    return {arxiv_id: papers[arxiv_id] for arxiv_id in arxiv_ids if arxiv_id in papers}
+
+
+# 一括取得に対応しているソースと、その取得関数
+BATCH_FETCHERS = {'pubmed': _batch_fetch_pubmed, 'arxiv': _batch_fetch_arxiv}
+
+
+def _prefetch_source(source, paper_ids):
+    """
+    1つのソースのIDをまとめて一括取得し、CSL-JSONをディスクキャッシュに書き込む
+    """
+    try:
+        prefetched = BATCH_FETCHERS[source](paper_ids)
+    except Exception as e:
+        logger.warning(f"Batch fetch failed ({source}): {_sanitize_error_message(e)}")
+        return
+    for paper_id, item in prefetched.items():
+        data = fetch_paper_data_csl(source, paper_id, prefetched=item)
+        if data:
+            _write_cache_file(_cache_file_path(source, paper_id), data)
+
+
+def prefetch_paper_data(entries):
+    """
+    まだキャッシュにないPubMed/arXivのIDをソースごとにまとめ、一括取得をスレッドプールに投入する。
+    ソースごとの一括取得は互いに、また他のIDの取得とも並行して行われる。
+    {ソース: Future} を返す（一括取得の対象になったソースのみ）。
+    一括取得に失敗したIDは、その後のget_paper_data_cslで個別に取得される
+    """
+    missing = {source: [] for source in BATCH_FETCHERS}
+    for source, paper_id in entries:
+        if source not in missing or paper_id in missing[source]:
+            continue
+        if not os.path.exists(_cache_file_path(source, paper_id)):
+            missing[source].append(paper_id)
+
+    batch_futures = {}
+    for source, paper_ids in missing.items():
+        # 1件だけなら個別取得と変わらないので一括取得しない
+        if len(paper_ids) < 2:
+            continue
+        batch_futures[source] = _fetch_pool.submit(_prefetch_source, source, paper_ids)
+    return batch_futures
+
 # データを保存するデバッグディレクトリ（デバッグモードでのみ作成）
 DEBUG_DIR = 'csl_debug_output'
 DEBUG_ENABLED = os.environ.get('DEBUG_MODE', 'false').lower() == 'true'
@@ -328,31 +564,133 @@ DEBUG_ENABLED = os.environ.get('DEBUG_MODE', 'false').lower() == 'true'
 if DEBUG_ENABLED and not os.path.exists(DEBUG_DIR):
     os.makedirs(DEBUG_DIR)
 
-def process_csl(csl_json_data, style_name, citation_number=None):
+# render_csl_unnumbered / apply_citation_numberで使う正規表現（呼び出しごとのパターン解釈を避けるため事前にコンパイル）
+_RE_ET_AL_DOT = re.compile(r'\bet al\.', re.IGNORECASE)
+_RE_ET_AL_NO_DOT = re.compile(r'\bet al\b(?!\.)', re.IGNORECASE)
+_RE_NUM_DOT_ALPHA = re.compile(r'(\d+\.)([A-Za-z])')
+_RE_NUM_DIV_ALPHA = re.compile(r'(\d+\.</div>)([A-Za-z])')
+_RE_LINE_NUM_DOT_ALPHA = re.compile(r'^(\d+\.)([A-Za-z])', re.MULTILINE)
+_RE_NUM_TAB = re.compile(r'\d+\.\t')
+_RE_LINE_NUM = re.compile(r'^(\s*)\d+\.(\s)', re.MULTILINE)
+# 通し番号に置き換える4つのパターンを1回の走査で処理するための正規表現
+_RE_CITATION_NUMBER = re.compile(
+    r'(?P<tab>\d+\.\t)'
+    r'|(?P<div><div class="csl-left-margin">)\d+(?P<div_end>\.?</div)(?=>)'
+    r'|(?P<line>^\s*)\d+\.(?P<line_end>\s)'
+    r'|(?P<gt>>)\s*\d+\.(?P<gt_end>\s)',
+    re.MULTILINE
+)
+_RE_MULTI_PERIOD = re.compile(r'\.\.+')
+_RE_SPACED_PERIODS = re.compile(r'\.\s+\.')
+
+def _replace_citation_number(match, citation_number):
+    """
+    _RE_CITATION_NUMBER でマッチしたパターンに応じて、番号を通し番号に置き換えた文字列を返す
+    """
+    if match.group('tab') is not None:
+        # パターン1: "数字.\t"
+        return f"{citation_number}.\t"
+    if match.group('div') is not None:
+        # パターン2: <div class="csl-left-margin">数字.</div>（閉じタグの'>'はパターン4のために残す）
+        return f"{match.group('div')}{citation_number}{match.group('div_end')}"
+    if match.group('line') is not None:
+        # パターン3: 行頭の "数字. " や "数字.\t"
+        return f"{match.group('line')}{citation_number}.{match.group('line_end')}"
+    # パターン4: HTMLタグ直後の番号
+    return f">{citation_number}.{match.group('gt_end')}"
+
+def _find_et_al_position(result_html, family):
+    """
+    et al. を挿入する位置（family nameに続くイニシャルの直後）を返す。
+    family nameの最後の出現位置（"family," を優先）から前方に1回だけ走査する
+    - "Smith, J. A. Title" -> "Smith, J. A." の直後
+    - イニシャルが続かない場合は family name の後の最初のピリオドの直後
+    - family nameが見つからない場合はNone
     """
-    citeproc-pyを使ってフォーマットする。
+    # 短いfamily name（例: 'Li'、'He'）はタイトル中の単語にも含まれるため、
+    # まず著者表記の "family," を探し、見つからない場合だけ family name そのものを探す
+    family_pos = result_html.rfind(family + ',')
+    if family_pos == -1:
+        family_pos = result_html.rfind(family)
+    if family_pos == -1:
+        return None
+    
+    length = len(result_html)
+    pos = family_pos + len(family)
+    insert_pos = None
+    
+    if pos < length and result_html[pos] == ',':
+        pos += 1
+        first_token = True
+        while True:
+            # イニシャル間の空白とハイフン（例: "J.-P."）を読み飛ばす
+            while pos < length and (result_html[pos].isspace() or result_html[pos] == '-'):
+                pos += 1
+            if pos >= length or not ('A' <= result_html[pos] <= 'Z'):
+                break
+            next_pos = pos + 1
+            if next_pos < length and result_html[next_pos] == '.':
+                # イニシャル: 大文字1文字 + ピリオド（例: 'J.'）
+                insert_pos = pos = next_pos + 1
+            elif next_pos < length and result_html[next_pos] == '-':
+                # ハイフンでつながるイニシャル（例: 'J-P.' の 'J'）
+                pos = next_pos
+            elif first_token:
+                # カンマ直後の最初のトークンに限り、ピリオドなしの大文字の並び（例: 'JA'）をイニシャルとみなす
+                # 2つ目以降で許すと、タイトル先頭の単語や略語（例: 'A study'、'NMR'）まで読み進めてしまう
+                while next_pos < length and 'A' <= result_html[next_pos] <= 'Z':
+                    next_pos += 1
+                if next_pos < length and result_html[next_pos].isalpha():
+                    # 大文字で始まる単語（タイトルなど）はイニシャルではない
+                    break
+                if next_pos < length and result_html[next_pos] == '.':
+                    next_pos += 1
+                insert_pos = next_pos
+                break
+            else:
+                break
+            first_token = False
+    
+    if insert_pos is not None:
+        return insert_pos
+    
+    period_pos = result_html.find('.', family_pos)
+    return period_pos + 1 if period_pos != -1 else None
+
+class _FixedNumberCitationItem(CitationItem):
+    """
+    書誌中の位置によらず citation-number を1として整形するCitationItem。
+    まとめて整形してもチャンクの区切りやワーカー数で番号が変わらず、1件ずつ整形した場合と同じ出力になる
+    （通し番号はapply_citation_numberで付ける）
+    """
+    @property
+    def number(self):
+        return 1
+
+
+def render_csl_unnumbered(csl_json_data, style_name, bib_entries=None):
+    """
+    citeproc-pyを使ってフォーマットする（通し番号の置き換え前まで）。
     修正版：formatterモジュールを正しく使用
+    citation-numberは常に1として整形するため、結果は文献リスト中の位置に依存せず、
+    (CSLデータ, スタイル) ごとにキャッシュできる
     
     Args:
         csl_json_data: CSL-JSON形式のデータ
         style_name: CSLスタイル名
-        citation_number: 通し番号（Noneの場合は番号を変更しない）
-    """
-    from citeproc import formatter
-    import re
+        bib_entries: process_csl_batchで生成済みの書誌エントリ（Noneの場合はここで生成する）
     
-    csl_path = get_csl_path(style_name)
-    if not csl_path:
-        return "Style Load Error"
-
+    Returns:
+        (HTML, 成功したか) のタプル。失敗した場合のHTMLはエラーメッセージ
+    """
     item_id = csl_json_data.get('id', 'unknown_id')
     debug_prefix = os.path.join(DEBUG_DIR, f"{item_id}_{style_name}")
 
     try:
         # --- DEBUG 1: 入力データ（デバッグモードでのみ） ---
         if DEBUG_ENABLED:
-            with open(f"{debug_prefix}_1_input_data.json", 'w', encoding='utf-8') as f:
-                json.dump(csl_json_data, f, indent=4, ensure_ascii=False)
+            with open(f"{debug_prefix}_1_input_data.json", 'wb') as f:
+                f.write(orjson.dumps(csl_json_data))
         
         # 著者情報の詳細ログ
         #print(f"\n=== Processing {item_id} ===")
@@ -363,23 +701,24 @@ def process_csl(csl_json_data, style_name, citation_number=None):
             #print(f"    given: {author.get('given', 'N/A')}")
             #print(f"    non-dropping-particle: {author.get('non-dropping-particle', 'N/A')}")
         
-        # 1. ソースの作成
-        json_src = CiteProcJSON([csl_json_data])
-        
-        # 2. スタイルの読み込み
-        bib_style = CitationStylesStyle(csl_path, validate=False)
-        
-        # 3. CitationStylesBibliographyの作成
-        # formatter.htmlを渡す（formatterはモジュール、htmlはその属性）
-        bibliography = CitationStylesBibliography(bib_style, json_src, formatter.html)
-        
-        # 4. Citationの作成と登録
-        citation = Citation([CitationItem(item_id)])
-        bibliography.register(citation)
-        
-        # 5. 書誌情報の生成
-        # bibliography()は各エントリのリストを返す
-        bib_entries = bibliography.bibliography()
+        if bib_entries is None:
+            # 1. ソースの作成
+            json_src = CiteProcJSON([csl_json_data])
+            
+            # 2. スタイルの読み込み（解析済みのスタイルをキャッシュから取得）
+            bib_style = _load_style(style_name)
+            
+            # 3. CitationStylesBibliographyの作成
+            # formatter.htmlを渡す（formatterはモジュール、htmlはその属性）
+            bibliography = CitationStylesBibliography(bib_style, json_src, formatter.html)
+            
+            # 4. Citationの作成と登録
+            citation = Citation([_FixedNumberCitationItem(item_id)])
+            bibliography.register(citation)
+            
+            # 5. 書誌情報の生成
+            # bibliography()は各エントリのリストを返す
+            bib_entries = bibliography.bibliography()
         
         result_html = ""
         
@@ -400,19 +739,19 @@ def process_csl(csl_json_data, style_name, citation_number=None):
         if not result_html.strip():
             #print(f"Warning: Empty result for {item_id}")
             
-            # デバッグ情報を保存
-            debug_info = {
-                "item_id": item_id,
-                "style": style_name,
-                "csl_data": csl_json_data,
-                "bib_entries_type": str(type(bib_entries)),
-                "bib_entries_content": str(bib_entries) if bib_entries else "None"
-            }
+            # デバッグ情報を保存（デバッグモードでのみ）
             if DEBUG_ENABLED:
-                with open(f"{debug_prefix}_3_debug_info.json", 'w', encoding='utf-8') as f:
-                    json.dump(debug_info, f, indent=4, ensure_ascii=False)
+                debug_info = {
+                    "item_id": item_id,
+                    "style": style_name,
+                    "csl_data": csl_json_data,
+                    "bib_entries_type": str(type(bib_entries)),
+                    "bib_entries_content": str(bib_entries) if bib_entries else "None"
+                }
+                with open(f"{debug_prefix}_3_debug_info.json", 'wb') as f:
+                    f.write(orjson.dumps(debug_info))
             
-            return f"CSL Formatting produced no output for {item_id}"
+            return f"CSL Formatting produced no output for {item_id}", False
         
         # 著者数をチェックして et al. の処理を行う
         author_count = len(csl_json_data.get('author', []))
@@ -438,19 +777,9 @@ def process_csl(csl_json_data, style_name, citation_number=None):
         if has_et_al:
             # 既存の "et al." または "et al" を斜体化
             # パターン1: "et al."
-            result_html = re.sub(
-                r'\bet al\.',
-                r'<i>et al.</i>',
-                result_html,
-                flags=re.IGNORECASE
-            )
+            result_html = _RE_ET_AL_DOT.sub(r'<i>et al.</i>', result_html)
             # パターン2: "et al" (ピリオドなし)
-            result_html = re.sub(
-                r'\bet al\b(?!\.)',
-                r'<i>et al.</i>',
-                result_html,
-                flags=re.IGNORECASE
-            )
+            result_html = _RE_ET_AL_NO_DOT.sub(r'<i>et al.</i>', result_html)
             #print("Italicized existing 'et al.'")
             
         elif authors_omitted:
@@ -468,148 +797,37 @@ def process_csl(csl_json_data, style_name, citation_number=None):
                     last_displayed_author_family = csl_json_data['author'][last_author_idx].get('family', '')
                     last_displayed_author_given = csl_json_data['author'][last_author_idx].get('given', '')
             
+            insert_pos = None
             if last_displayed_author_family and last_displayed_author_given:
-                # given nameの処理されたバージョン（イニシャル化されている可能性がある）
-                # HTMLに含まれるイニシャルを検出
+                # 最後に表示されている著者のイニシャルの直後に挿入する
                 # 例: "Smith, J. A." の場合、"J. A." の後に挿入
-                
-                # given nameからイニシャル部分を抽出（ピリオドを含む）
-                # 例: "J. A." や "John" など
-                
-                # 最も確実な方法: family nameの後に続くgiven name部分を探す
-                # パターン: "FamilyName, GivenInitials" の後
-                
-                # family nameの位置を探す（最後の出現）
-                family_pattern = re.escape(last_displayed_author_family)
-                
-                # family nameの後に続く部分（カンマとイニシャル）を検出
-                # 例: "Smith, J. A." または "Smith, John"
-                author_pattern = family_pattern + r',\s+([A-Z]\.?\s*)+\.?'
-                
-                matches = list(re.finditer(author_pattern, result_html))
-                
-                if matches:
-                    # 最後のマッチを使用（同じ著者名が複数回出現する可能性があるため）
-                    last_match = matches[-1]
-                    insert_pos = last_match.end()
-                    
-                    # その位置に et al. を挿入
-                    result_html = (
-                        result_html[:insert_pos] + 
-                        ' <i>et al.</i>' + 
-                        result_html[insert_pos:]
-                    )
-                    #print(f"Inserted 'et al.' after given name (pattern match)")
-                else:
-                    # パターンマッチに失敗した場合の代替方法
-                    # family nameの最後の出現位置を探し、その後の最初のピリオドの後に挿入
-                    last_family_pos = result_html.rfind(last_displayed_author_family)
-                    
-                    if last_family_pos != -1:
-                        # その位置以降で最初のピリオドを探す
-                        # ただし、given nameの範囲内で探す（次の単語の前まで）
-                        search_range = result_html[last_family_pos:last_family_pos + 100]
-                        
-                        # カンマの後のイニシャル部分を探す
-                        # 例: ", J. A." の終わり
-                        initial_pattern = r',\s+[A-Z]\.?(?:\s+[A-Z]\.?)*\.?'
-                        initial_match = re.search(initial_pattern, search_range)
-                        
-                        if initial_match:
-                            insert_pos = last_family_pos + initial_match.end()
-                            result_html = (
-                                result_html[:insert_pos] + 
-                                ' <i>et al.</i>' + 
-                                result_html[insert_pos:]
-                            )
-                            #print(f"Inserted 'et al.' after given name (fallback pattern)")
-                        else:
-                            # イニシャルパターンが見つからない場合
-                            # family nameの後の最初のピリオドの後に挿入
-                            period_pos = result_html.find('.', last_family_pos)
-                            if period_pos != -1:
-                                result_html = (
-                                    result_html[:period_pos + 1] + 
-                                    ' <i>et al.</i>' + 
-                                    result_html[period_pos + 1:]
-                                )
-                                #print(f"Inserted 'et al.' after period (last fallback)")
-                            else:
-                                result_html = result_html.rstrip() + ' <i>et al.</i>'
-                                #print(f"Inserted 'et al.' at end (no period found)")
-                    else:
-                        result_html = result_html.rstrip() + ' <i>et al.</i>'
-                        #print(f"Inserted 'et al.' at end (family name not found)")
+                insert_pos = _find_et_al_position(result_html, last_displayed_author_family)
+            
+            if insert_pos is None:
+                # 挿入位置が見つからない・著者情報が取得できない場合は末尾に追加
+                head, tail = result_html.rstrip(), ''
             else:
-                # 著者情報が取得できない場合は末尾に追加
-                result_html = result_html.rstrip() + ' <i>et al.</i>'
-                #print(f"Inserted 'et al.' at end (no author info)")
+                head, tail = result_html[:insert_pos], result_html[insert_pos:]
+            # 中間の文字列を作らないよう1回の連結で組み立てる
+            result_html = f"{head} <i>et al.</i>{tail}"
         #else:
             #print("No author omission detected")
         
         
         # まず、CSLが生成した番号の後ろ（ピリオドの後）にタブを挿入
         # パターン1: "数字."の直後に文字が来る場合（例: "1.Author"）
-        result_html = re.sub(r'(\d+\.)([A-Za-z])', r'\1\t\2', result_html)
+        result_html = _RE_NUM_DOT_ALPHA.sub(r'\1\t\2', result_html)
         
         # パターン2: HTMLタグ内の番号（例: <div>1.</div>の後に続くテキスト）
-        result_html = re.sub(r'(\d+\.</div>)([A-Za-z])', r'\1\t\2', result_html)
+        result_html = _RE_NUM_DIV_ALPHA.sub(r'\1\t\2', result_html)
         
         # パターン3: 行頭の番号（スペースやタブなしで著者名が続く場合）
-        result_html = re.sub(r'^(\d+\.)([A-Za-z])', r'\1\t\2', result_html, flags=re.MULTILINE)
-        
-        # 通し番号に置き換える処理（タブを目印にする）
-        if citation_number is not None:
-            # パターン1: "数字.\t" の形式を通し番号に置き換え
-            result_html = re.sub(
-                r'\d+\.\t',
-                f'{citation_number}.\t',
-                result_html
-            )
-            # パターン2: <div class="csl-left-margin">数字.</div> のような形式
-            result_html = re.sub(
-                r'(<div class="csl-left-margin">)\d+(\.?</div>)',
-                rf'\g<1>{citation_number}\g<2>',
-                result_html
-            )
-            # パターン3: 行頭の "数字. " や "数字.\t" 
-            result_html = re.sub(
-                r'^(\s*)\d+\.(\s)',
-                rf'\g<1>{citation_number}.\g<2>',
-                result_html,
-                flags=re.MULTILINE
-            )
-            # パターン4: HTMLタグ直後の番号
-            result_html = re.sub(
-                r'(>)\s*\d+\.(\s)',
-                rf'\g<1>{citation_number}.\g<2>',
-                result_html
-            )
-        else: #citation number is None (=アルファベット順の場合)
-            # パターン1: "数字.\t" の形式を削除
-            result_html = re.sub(
-                r'\d+\.\t',
-                f'',
-                result_html
-            )
-        
-        # タブを視覚的に保持するためにHTMLエンティティに変換
-        # 方法1: 複数のnon-breaking spaceで表現（4つのスペース相当）
-        result_html = result_html.replace('\t', '&nbsp;&nbsp;&nbsp;&nbsp;')
+        result_html = _RE_LINE_NUM_DOT_ALPHA.sub(r'\1\t\2', result_html)
         
-        # 二重ピリオドを単一ピリオドに修正
-        # パターン1: ".." を "." に
-        result_html = re.sub(r'\.\.+', '.', result_html)
-        # パターン2: ". ." のようなスペースを含むパターンも修正
-        result_html = re.sub(r'\.\s+\.', '.', result_html)
-
-        # --- DEBUG 4: 最終整形結果（デバッグモードでのみ） ---
-        if DEBUG_ENABLED:
-            with open(f"{debug_prefix}_4_final_html_output.html", 'w', encoding='utf-8') as f:
-                f.write(result_html)
-            
-        return result_html
+        return result_html, True
 
+    except _StyleLoadError:
+        return "Style Load Error", False
     except Exception as e:
         import traceback
         error_info = traceback.format_exc()
@@ -618,7 +836,167 @@ def process_csl(csl_json_data, style_name, citation_number=None):
                 f.write(error_info)
         #print(f"CSL Processing Error: {str(e)}")
         #print(error_info)
-        return f"CSL Formatting Error for {item_id}: {str(e)}"
+        return f"CSL Formatting Error for {item_id}: {str(e)}", False
+
+
+def apply_citation_number(result_html, citation_number):
+    """
+    render_csl_unnumberedの結果に通し番号を付け、表示用の最終整形を行う
+    
+    Args:
+        result_html: render_csl_unnumberedが返したHTML
+        citation_number: 通し番号（Noneの場合は番号を削除する）
+    """
+    # 通し番号に置き換える処理（タブを目印にする）
+    if citation_number is not None:
+        # パターン1〜4（"数字.\t"、csl-left-margin、行頭、HTMLタグ直後）を1回の走査で置き換え
+        result_html = _RE_CITATION_NUMBER.sub(
+            lambda match: _replace_citation_number(match, citation_number),
+            result_html
+        )
+    else: #citation number is None (=アルファベット順の場合)
+        # パターン1: "数字.\t" の形式を削除
+        result_html = _RE_NUM_TAB.sub('', result_html)
+        # パターン3: 行頭の "数字. " も削除（まとめて整形した場合は番号が文献ごとに異なるため）
+        result_html = _RE_LINE_NUM.sub(r'\g<1>', result_html)
+    
+    # タブを視覚的に保持するためにHTMLエンティティに変換
+    # 方法1: 複数のnon-breaking spaceで表現（4つのスペース相当）
+    result_html = result_html.replace('\t', '&nbsp;&nbsp;&nbsp;&nbsp;')
+    
+    # 二重ピリオドを単一ピリオドに修正
+    # パターン1: ".." を "." に
+    result_html = _RE_MULTI_PERIOD.sub('.', result_html)
+    # パターン2: ". ." のようなスペースを含むパターンも修正
+    result_html = _RE_SPACED_PERIODS.sub('.', result_html)
+
+    # 最終整形結果はHTTPレスポンスとして返るため、デバッグファイルには書き出さない
+    return result_html
+
+
+def process_csl_batch(csl_json_list, style_name):
+    """
+    複数の文献を1つのCiteProcJSON / CitationStylesBibliographyでまとめて整形する。
+    書誌の生成は1回で行い、et al. などの後処理は文献ごとにrender_csl_unnumberedで行う。
+    通し番号は呼び出し側でapply_citation_numberにより付ける。
+    
+    Args:
+        csl_json_list: CSL-JSON形式のデータのリスト
+        style_name: CSLスタイル名
+    
+    Returns:
+        入力と同じ順序の (HTML, 成功したか) のリスト
+    """
+    # CiteProcJSONはIDを小文字で扱うため、同じIDは1回だけ登録する
+    keys = [str(csl_json_data.get('id', 'unknown_id')).lower() for csl_json_data in csl_json_list]
+    unique_keys = list(dict.fromkeys(keys))
+    
+    try:
+        bib_style = _load_style(style_name)
+        bibliography = CitationStylesBibliography(bib_style, CiteProcJSON(csl_json_list), formatter.html)
+        for key in unique_keys:
+            bibliography.register(Citation([_FixedNumberCitationItem(key)]))
+        # sort()を呼ばないので、書誌エントリは登録順（入力順）で返される
+        bib_entries = bibliography.bibliography()
+        # 出力が空のエントリや登録されなかったIDは書誌から抜けるため、件数が合わないと対応がずれる
+        if len(bib_entries) == len(unique_keys):
+            entries = dict(zip(unique_keys, bib_entries))
+        else:
+            logger.warning(f"Batch CSL formatting returned {len(bib_entries)} entries for {len(unique_keys)} items, falling back to per-item formatting")
+            entries = None
+    except _StyleLoadError:
+        return [("Style Load Error", False)] * len(csl_json_list)
+    except Exception as e:
+        # まとめての整形に失敗した場合は1件ずつ整形し、エラーを該当文献だけに限定する
+        logger.warning(f"Batch CSL formatting failed, falling back to per-item formatting: {str(e)}")
+        entries = None
+    
+    results = []
+    for key, csl_json_data in zip(keys, csl_json_list):
+        bib_entries = [entries[key]] if entries is not None else None
+        results.append(render_csl_unnumbered(csl_json_data, style_name, bib_entries))
+    return results
+
+
+def _init_csl_worker():
+    """
+    CSL整形用ワーカープロセスの初期化。スタイルのキャッシュはプロセスごとに持つため、
+    デフォルトスタイルを先に読み込んでおく
+    """
+    try:
+        _load_style(DEFAULT_STYLE)
+    except _StyleLoadError:
+        pass
+
+# CSL整形用のプロセスプール（citeproc-pyの整形はCPU処理でGILを保持するため）
+# ワーカープロセスは最初のsubmit時に起動される
+CSL_MAX_WORKERS = os.cpu_count() or 1
+
+
+def _new_csl_pool():
+    """
+    CSL整形用のプロセスプールを作る。
+    ワーカーはリクエスト処理中に起動されるため、他のスレッドが持っているロック
+    （http_sessionの接続プールなど）を引き継がないようforkではなくspawnで起動する
+    """
+    return ProcessPoolExecutor(
+        max_workers=CSL_MAX_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_csl_worker
+    )
+
+_csl_pool = _new_csl_pool()
+_csl_pool_lock = threading.Lock()
+
+
+def _recreate_csl_pool(broken_pool):
+    """
+    ワーカーの異常終了などで使えなくなったプールを作り直す。
+    他のスレッドがすでに作り直している場合は何もしない
+    """
+    global _csl_pool
+    with _csl_pool_lock:
+        if _csl_pool is broken_pool:
+            logger.error("CSL process pool is broken. Recreating it.")
+            _csl_pool = _new_csl_pool()
+            broken_pool.shutdown(wait=False)
+
+# 整形結果（通し番号を付ける前のHTML）のキャッシュ
+# どの文献がどのワーカーに割り当てられるかはリクエストごとに変わるため、ワーカー側ではなくこのプロセスで持つ
+RENDER_CACHE_SIZE = 2048
+_render_cache = OrderedDict()
+_render_cache_lock = threading.Lock()
+
+
+def _render_cache_key(csl_json_data, style_name):
+    """整形結果キャッシュのキー（CSLデータはキー順を揃えてシリアライズする）"""
+    return orjson.dumps(csl_json_data, option=orjson.OPT_SORT_KEYS), style_name
+
+
+def _get_cached_render(key):
+    with _render_cache_lock:
+        result_html = _render_cache.get(key)
+        if result_html is not None:
+            _render_cache.move_to_end(key)
+        return result_html
+
+
+def _put_cached_render(key, result_html):
+    with _render_cache_lock:
+        _render_cache[key] = result_html
+        _render_cache.move_to_end(key)
+        if len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+
+
+def _error_row(label, original_id, citation_number):
+    """
+    エラー行のHTMLを作る（IDはHTMLエスケープする。通し番号がNoneの場合は番号を付けない）
+    """
+    error_message = f"<span style='color:red'>{label}: {html.escape(original_id)}</span>"
+    if citation_number is not None:
+        error_message = f"{citation_number}. {error_message}"
+    return error_message
 
 
 @app.route('/')
@@ -661,6 +1039,20 @@ def validate_style_name(style_name):
     
     return style_name
 
+# 入力IDの種類を判別する正規表現（PMID / bioRxivのDOI / arXiv ID）
+_ID_RE = re.compile(r'^(?P<pmid>\d+)$|^(?P<biorxiv>10\.1101/\S+)$|^(?P<arxiv>\d{4}\.\d{4,6}(v\d+)?)$')
+
+def detect_source(paper_id):
+    """
+    IDの形式から取得元を判別する。どれにも当てはまらない場合はPubMedとして扱う
+    """
+    match = _ID_RE.match(paper_id)
+    if match is None or match.group('pmid'):
+        return 'pubmed'
+    if match.group('biorxiv'):
+        return 'biorxiv'
+    return 'arxiv'
+
 @app.route('/generate', methods=['POST'])
 def generate():
     # 入力値のサニタイズと検証
@@ -672,86 +1064,184 @@ def generate():
     
     sort_alphabetically = bool(request.json.get('sortAlphabetically', False))
     
-    # 一時的に全データを格納するリスト
-    citation_data = []
-    
+    # 入力行ごとにIDの種類を判別
+    entries = []
     for line in input_text.splitlines():
         line = line.strip()
         if not line: continue
         
-        # ID判別ロジック
-        if line.isdigit():
-            source = 'pubmed'
-        elif '10.1101' in line:
-            source = 'biorxiv'
-        elif '.' in line and len(line) < 15:
-            source = 'arxiv'
-        else:
-            source = 'pubmed'
-
-        csl_data = fetch_paper_data_csl(source, line)
+        entries.append((detect_source(line), line))
+    
+    # PubMed/arXivはまとめて一括取得する（結果はキャッシュ経由で参照される）
+    batch_futures = prefetch_paper_data(entries)
+    
+    csl_pool = _csl_pool
+    render_futures = {}  # process_csl_batchのFuture -> チャンク（(表示位置, CSLデータ, 通し番号, キャッシュキー)のリスト）
+    
+    def start_rendering(items):
+        """
+        (表示位置, CSLデータ, 通し番号) のリストの整形を始める。
+        整形済みのものはキャッシュから取り出して通し番号だけ付け、(表示位置, HTML) のリストとして返す。
+        残りはワーカー数に合わせて分割し、各チャンクをプロセスプールでまとめて整形する
+        """
+        rows = []
+        uncached_items = []
+        for index, csl_data, number in items:
+            key = _render_cache_key(csl_data, style_name)
+            cached_html = _get_cached_render(key)
+            if cached_html is not None:
+                rows.append((index, apply_citation_number(cached_html, number)))
+            else:
+                uncached_items.append((index, csl_data, number, key))
+        
+        if uncached_items:
+            chunk_size = -(-len(uncached_items) // CSL_MAX_WORKERS)
+            for start in range(0, len(uncached_items), chunk_size):
+                chunk = uncached_items[start:start + chunk_size]
+                csl_json_list = [csl_data for _, csl_data, _, _ in chunk]
+                try:
+                    future = csl_pool.submit(process_csl_batch, csl_json_list, style_name)
+                except BrokenProcessPool:
+                    # プールが使えない場合は作り直し、このチャンクはプロセス内（スレッドプール）で整形する
+                    _recreate_csl_pool(csl_pool)
+                    future = _fetch_pool.submit(process_csl_batch, csl_json_list, style_name)
+                render_futures[future] = chunk
+        return rows
+    
+    def collect_rendered(future, chunk):
+        """
+        チャンクの整形結果を返す。整形中にワーカーが異常終了した場合はプールを作り直し、プロセス内で整形する
+        """
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            _recreate_csl_pool(csl_pool)
+            return process_csl_batch([csl_data for _, csl_data, _, _ in chunk], style_name)
+    
+    def finish_rendering(future):
+        """
+        整形が終わったチャンクの (表示位置, HTML) のリストを返す
+        """
+        chunk = render_futures.pop(future)
+        try:
+            rendered = collect_rendered(future, chunk)
+        except Exception as e:
+            # ステータス200と件数はすでに送っているため、例外で応答を打ち切らずにチャンク内の各行をエラーとして返す
+            logger.error(f"CSL formatting failed for {len(chunk)} items: {str(e)}")
+            return [
+                (index, _error_row("Formatting Error", str(csl_data.get('id', 'unknown_id')), number))
+                for index, csl_data, number, _ in chunk
+            ]
+        
+        rows = []
+        for (index, _, number, key), (result_html, ok) in zip(chunk, rendered):
+            if ok:
+                # エラーメッセージはキャッシュしない（一時的な失敗の可能性があるため）
+                _put_cached_render(key, result_html)
+                result_html = apply_citation_number(result_html, number)
+            rows.append((index, result_html))
+        return rows
+    
+    def arrange_alphabetically(fetched):
+        """
+        アルファベット順の場合の並べ替え。全件の取得結果から、
+        取得エラーの (表示位置, HTML) のリストと、整形する (表示位置, CSLデータ, 通し番号) のリストを返す
+        """
+        # 一時的に全データを格納するリスト
+        citation_data = []
+        
+        for (source, line), csl_data in zip(entries, fetched):
+            if csl_data:
+                # ソート用のキーを取得（第一著者の姓）
+                first_author_family = ""
+                if csl_data.get('author') and len(csl_data['author']) > 0:
+                    first_author_family = csl_data['author'][0].get('family', '')
+                
+                citation_data.append({
+                    'csl_data': csl_data,
+                    'sort_key': first_author_family.lower(),
+                    'original_id': line,
+                    'error': False
+                })
+            else:
+                citation_data.append({
+                    'csl_data': None,
+                    'sort_key': '',
+                    'original_id': line,
+                    'error': True
+                })
         
-        if csl_data:
-            # ソート用のキーを取得（第一著者の姓）
-            first_author_family = ""
-            if csl_data.get('author') and len(csl_data['author']) > 0:
-                first_author_family = csl_data['author'][0].get('family', '')
-            
-            citation_data.append({
-                'csl_data': csl_data,
-                'sort_key': first_author_family.lower(),
-                'original_id': line,
-                'error': False
-            })
-        else:
-            citation_data.append({
-                'csl_data': None,
-                'sort_key': '',
-                'original_id': line,
-                'error': True
-            })
-    
-    # アルファベット順ソートが指定されている場合
-    if sort_alphabetically:
         # エラーでないものだけソート、エラーは最後に
         valid_citations = [c for c in citation_data if not c['error']]
         error_citations = [c for c in citation_data if c['error']]
         valid_citations.sort(key=lambda x: x['sort_key'])
         citation_data = valid_citations + error_citations
-    
-    # 結果リストに変換
-    results = []
-    citation_number = 1
-    
-    for item in citation_data:
-        if item['error']:
-            # エラーの場合 - HTMLエスケープを適用
-            escaped_id = html.escape(item['original_id'])
-            if sort_alphabetically:
-                # アルファベット順の場合は番号なし
-                error_message = f"<span style='color:red'>Not Found or Fetch Error: {escaped_id}</span>"
+        
+        # アルファベット順の場合は通し番号を付けない（None を渡す）
+        error_rows = []
+        valid_items = []
+        for index, item in enumerate(citation_data):
+            if item['error']:
+                error_rows.append((index, _error_row("Not Found or Fetch Error", item['original_id'], None)))
             else:
-                # 通常の場合は番号付き
-                error_message = f"{citation_number}. <span style='color:red'>Not Found or Fetch Error: {escaped_id}</span>"
-                citation_number += 1
-            results.append(error_message)
-        else:
-            # 正常な引用文献の場合
-            if sort_alphabetically:
-                # アルファベット順の場合は通し番号を付けない（None を渡す）
-                formatted_html = process_csl(item['csl_data'], style_name, citation_number=None)
+                valid_items.append((index, item['csl_data'], None))
+        return error_rows, valid_items
+    
+    def stream_citations():
+        """
+        1行1JSON（NDJSON）で結果を送る。全件の取得・整形を待たずに、終わったものから順に送る
+        - 1行目: {"total": 件数}（クライアント側で表示枠を用意するため）
+        - 以降: {"idx": 表示位置, "html": 整形済みHTML}
+        通常の場合は通し番号が入力順（取得エラーの行も番号を使う）で決まるため、取得できたものから整形する。
+        アルファベット順の場合は並べ替えに全件が必要なので、全件の取得が終わってから整形する
+        """
+        yield orjson.dumps({'total': len(entries)}) + b'\n'
+        
+        fetched = [None] * len(entries)
+        fetch_futures = {}  # get_paper_data_cslのFuture -> 入力の位置
+        waiting = {}  # 一括取得のFuture -> 一括取得が終わってから取得する入力の位置のリスト
+        for index, (source, line) in enumerate(entries):
+            if source in batch_futures:
+                waiting.setdefault(batch_futures[source], []).append(index)
             else:
-                # 通常の場合は通し番号を付ける
-                formatted_html = process_csl(item['csl_data'], style_name, citation_number)
-                citation_number += 1
+                fetch_futures[_fetch_pool.submit(get_paper_data_csl, source, line)] = index
+        
+        while waiting or fetch_futures or render_futures:
+            done, _ = wait([*waiting, *fetch_futures, *render_futures], return_when=FIRST_COMPLETED)
+            rows = []
+            fetched_indexes = []
+            for future in done:
+                if future in waiting:
+                    # 一括取得が終わったソースのIDを取得する（キャッシュから読まれる）
+                    for index in waiting.pop(future):
+                        fetch_futures[_fetch_pool.submit(get_paper_data_csl, *entries[index])] = index
+                elif future in fetch_futures:
+                    index = fetch_futures.pop(future)
+                    fetched[index] = future.result()
+                    fetched_indexes.append(index)
+                else:
+                    rows.extend(finish_rendering(future))
+            
+            if not sort_alphabetically:
+                items = []
+                for index in sorted(fetched_indexes):
+                    if fetched[index]:
+                        items.append((index, fetched[index], index + 1))
+                    else:
+                        rows.append((index, _error_row("Not Found or Fetch Error", entries[index][1], index + 1)))
+                rows.extend(start_rendering(items))
+            elif fetched_indexes and not waiting and not fetch_futures:
+                error_rows, valid_items = arrange_alphabetically(fetched)
+                rows.extend(error_rows)
+                rows.extend(start_rendering(valid_items))
             
-            results.append(formatted_html)
-            #print(item['csl_data'])
-            #print(formatted_html)
+            for index, formatted_html in rows:
+                yield orjson.dumps({'idx': index, 'html': formatted_html}) + b'\n'
 
-    return jsonify({'citations': results})
+    return Response(stream_with_context(stream_citations()), mimetype='application/x-ndjson')
 
 if __name__ == '__main__':
     # サーバーを起動
     #app.run(debug=False, port=5000)
-    serve(app, host="127.0.0.1", port=5000)
\ No newline at end of file
+    # 外部APIの応答待ちが中心なので、既定(4)より多くのスレッドで同時リクエストを捌く
+    serve(app, host="127.0.0.1", port=5000, threads=32, connection_limit=200, channel_timeout=120)
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+通し番号と整形結果キャッシュのテスト（ネットワークには接続しない）
+
+実行: python -m unittest test_app
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import orjson
+
+import app
+
+# 番号を "[N]" 形式で出力するスタイル（nature.cslの番号部分だけを書き換える）
+BRACKET_STYLE = 'nature-bracket'
+
+
+def _paper(paper_id):
+    """
+    テスト用のCSL-JSON（IDごとに異なる著者・タイトル）
+    """
+    number = paper_id.rsplit('/', 1)[-1]
+    return {
+        "id": paper_id,
+        "type": "article-journal",
+        "title": f"Title {number}",
+        "container-title": "bioRxiv",
+        "page": paper_id,
+        "author": [{"family": f"Author{number}", "given": "J. A."}],
+        "issued": {"date-parts": [[2020]]}
+    }
+
+
+class CitationNumberTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+        csl_dir = os.path.join(self.tmp_dir, 'csl_styles')
+        os.makedirs(csl_dir)
+        with open(os.path.join(app.CSL_DIR, 'nature.csl'), encoding='utf-8') as f:
+            nature = f.read()
+        with open(os.path.join(csl_dir, 'nature.csl'), 'w', encoding='utf-8') as f:
+            f.write(nature)
+        with open(os.path.join(csl_dir, f'{BRACKET_STYLE}.csl'), 'w', encoding='utf-8') as f:
+            f.write(nature.replace(
+                '<text variable="citation-number" suffix="."/>',
+                '<text variable="citation-number" prefix="[" suffix="]"/>'
+            ))
+
+        # 取得はスタブにし、整形はプロセス内で行う（ワーカープロセスにはパッチが効かないため）
+        csl_pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(csl_pool.shutdown)
+        for name, value in (
+            ('CSL_DIR', csl_dir),
+            ('CACHE_DIR', os.path.join(self.tmp_dir, 'csl_cache')),
+            ('KNOWN_STYLES', None),
+            ('CSL_MAX_WORKERS', 2),
+            ('_csl_pool', csl_pool),
+            ('fetch_paper_data_csl', lambda source_type, paper_id, prefetched=None: _paper(paper_id)),
+        ):
+            patcher = mock.patch.object(app, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        app._fetch_paper_data_cached.cache_clear()
+        app._style_cache.__dict__.clear()
+        app._render_cache.clear()
+        self.addCleanup(app._render_cache.clear)
+        self.client = app.app.test_client()
+
+    def generate(self, numbers, style_name):
+        """
+        bioRxiv形式のIDで/generateを呼び、表示位置順のHTMLのリストを返す
+        """
+        ids = '\n'.join(f'10.1101/{number}' for number in numbers)
+        response = self.client.post('/generate', json={'ids': ids, 'style': style_name})
+        lines = [orjson.loads(line) for line in response.get_data().splitlines() if line]
+        rows = [None] * lines[0]['total']
+        for line in lines[1:]:
+            rows[line['idx']] = line['html']
+        return rows
+
+    def test_batch_position_does_not_change_rendering(self):
+        # 同じ文献は、まとめて整形したときの位置によらず1件だけの整形と同じ結果になる
+        papers = [_paper(f'10.1101/{number}') for number in range(30, 39)]
+        alone = app.render_csl_unnumbered(papers[5], BRACKET_STYLE)
+        in_batch = app.process_csl_batch(papers, BRACKET_STYLE)[5]
+        self.assertEqual(in_batch, alone)
+
+    def test_cached_rendering_is_independent_of_list_position(self):
+        # 1回目は10.1101/35が6番目、2回目は3番目。2回目はキャッシュから整形結果を使う
+        self.generate(range(30, 39), BRACKET_STYLE)
+        cached = self.generate([1, 2, 35, 36], BRACKET_STYLE)
+
+        app._render_cache.clear()
+        fresh = self.generate([1, 2, 35, 36], BRACKET_STYLE)
+        self.assertEqual(cached, fresh)
+        self.assertTrue(all(row.startswith('[1]') for row in cached), cached)
+
+    def test_sequential_numbers_follow_list_position(self):
+        self.generate(range(30, 39), 'nature')
+        rows = self.generate([1, 2, 35, 36], 'nature')
+        for position, row in enumerate(rows, start=1):
+            self.assertTrue(row.startswith(f'{position}.'), row)
+        self.assertIn('Author35', rows[2])
+
+
+if __name__ == '__main__':
+    unittest.main()